@@ -1,120 +1,355 @@
-import json, time, logging, os, sys, threading
+import json, time, os, sys, threading, queue, signal, hashlib, ctypes, dataclasses
 from datetime import datetime
 from modules.MQTT_communicator import MQTT_communicator
 from modules.environmental_module import environmental_module
 from modules.security_module import security_module
 from modules.device_control_module import device_control_module
 from modules.config_loader import load_config
+from modules._logging import configure_logging, logger_for
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+__all__ = ["DomiSafeApp"]
+
+logger = logger_for(__name__)
+
+# orjson serializes straight to bytes in C (dataclasses included); fall back to stdlib json when missing
+try:
+    import orjson
+    _dumps = orjson.dumps
+except Exception:
+    orjson = None  # type: ignore
+
+    def _dumps(obj):
+        return json.dumps(obj, default=dataclasses.asdict).encode()
+
+# Linux syncfs(2) commits every dirty file on the log filesystem in one call
+_syncfs = None
+if sys.platform.startswith("linux"):
+    try:
+        _syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+    except (OSError, AttributeError):
+        _syncfs = None
 
 ENV_FEEDS = {"temperature": "temperature", "humidity": "humidity", "pressure": "pressure"}
 SECURITY_FEEDS = {
     "motion_detected": "motion",
     "led_status": "led_status",
     "buzzer_status": "buzzer_status",
-    "image_b64": "camera_last_image",
 }
+# Snapshots go out on their own thread so a large payload never delays sensor feeds
+IMAGE_FEEDS = {"image_b64": "camera_last_image"}
+# Status feeds that rarely change: only re-sent on change or every STATUS_RESYNC_INTERVAL
+DELTA_FEEDS = {"led_status", "buzzer_status"}
+# Published with retain=True so the broker holds the last state across reconnects;
+# high-rate env readings and motion events stay non-retained
+RETAINED_FEEDS = {"led_status", "buzzer_status", "camera_last_image"}
 
 class DomiSafeApp:
     def __init__(self, config_file='config.json'):
+        # Parsed once here and shared with every module
         self.config = load_config(config_file)
         self.security_check_interval = int(self.config.get("security_check_interval", 10))
         self.env_interval = int(self.config.get("env_interval", 30))
-        self.last_publish_time = 0
-        self.publish_cooldown = 1.5  # seconds between publishes
+        self.flushing_interval = int(self.config.get("flushing_interval", 10))
+        # Token bucket shared by every publisher (Adafruit IO free tier: 30 msgs/min)
+        self.max_publishes_per_sec = float(self.config.get("MAX_PUBLISHES_PER_SEC", 0.5))
+        self.publish_burst = int(self.config.get("PUBLISH_BURST", 4))
+        self._tokens = float(self.publish_burst)
+        self._tokens_ts = time.monotonic()
+        self._tokens_lock = threading.Lock()
+        # Optional Adafruit IO groups: when set, a tick updates all its feeds in one message
+        self.env_group = self.config.get("ENV_GROUP")
+        self.security_group = self.config.get("SECURITY_GROUP")
+        self.status_resync_interval = float(self.config.get("STATUS_RESYNC_INTERVAL", 60))
+        self._last_sent = {}  # feed -> (value, monotonic time of last successful publish)
+        self.pin_threads = bool(self.config.get("PIN_THREADS", True))
         self.running = True
+        self._stop_evt = threading.Event()
 
         # Initialize modules safely
         try:
-            self.mqtt_agent = MQTT_communicator(config_file)
+            self.mqtt_agent = MQTT_communicator.get_instance(self.config)
         except Exception as e:
             logger.error(f"MQTT init failed: {e}", exc_info=True)
             self.mqtt_agent = None
         try:
-            self.env_data = environmental_module(config_file)
+            self.env_data = environmental_module(self.config)
         except Exception as e:
             logger.error(f"Env module init failed: {e}", exc_info=True)
             self.env_data = None
         try:
-            self.security_data = security_module(config_file)
+            self.security_data = security_module(self.config)
         except Exception as e:
             logger.error(f"Security module init failed: {e}", exc_info=True)
             self.security_data = None
         try:
-            self.device_control = device_control_module(config_file)
+            self.device_control = device_control_module(self.config)
         except Exception as e:
             logger.error(f"Device control init failed: {e}", exc_info=True)
             self.device_control = None
 
-        os.makedirs("logs", exist_ok=True)
-        time.sleep(3)
+        # Local JSONL history (archived daily by upload_yesterday.py); disk I/O
+        # happens on the writer thread so the collection loop only enqueues.
+        self.log_dir = "logs"
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._write_q = queue.SimpleQueue()
+        self._log_date = None
+        self._log_rollover = 0.0
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+
+        self._img_q = queue.Queue(maxsize=1)
+        self._image_sender = threading.Thread(target=self._image_sender_loop, daemon=True)
+        self._image_sender.start()
+
+        # Returns as soon as the CONNACK is in instead of always sleeping 3 s
+        if self.mqtt_agent:
+            self.mqtt_agent.connected_evt.wait(3)
 
     # ---- Safe MQTT publishing ----
-    def send_to_cloud(self, data, feeds):
-        ok_all = True
-        now = time.time()
-        for field, feed in feeds.items():
-            val = data.get(field)
-            if val is None:
+    def _take_tokens(self, n):
+        """Block until n publishes fit in the rate limit; callers queue up in arrival order."""
+        if self.max_publishes_per_sec <= 0:
+            return  # unthrottled
+        with self._tokens_lock:
+            now = time.monotonic()
+            self._tokens = min(self.publish_burst,
+                               self._tokens + (now - self._tokens_ts) * self.max_publishes_per_sec)
+            self._tokens_ts = now
+            self._tokens -= n
+            delay = -self._tokens / self.max_publishes_per_sec if self._tokens < 0 else 0
+        if delay > 0:
+            self._stop_evt.wait(delay)
+
+    def _unchanged(self, feed, value, now):
+        last = self._last_sent.get(feed)
+        return (feed in DELTA_FEEDS and last is not None and last[0] == value
+                and now - last[1] < self.status_resync_interval)
+
+    def send_to_cloud(self, data, feeds, group=None):
+        now = time.monotonic()
+        items = [(feed, data[field]) for field, feed in feeds.items()
+                 if data.get(field) is not None and not self._unchanged(feed, data[field], now)]
+        if not items:
+            return True
+        if not self.mqtt_agent:
+            return False
+        self._take_tokens(len(items))
+        if group:
+            ok = self.mqtt_agent.publish_group(group, dict(items))
+        else:
+            ok = self.mqtt_agent.send_many(dict(items), RETAINED_FEEDS) == len(items)
+        if ok:
+            for feed, value in items:
+                if feed in DELTA_FEEDS:  # only these are ever compared
+                    self._last_sent[feed] = (value, now)
+        return ok
+
+    def _queue_image(self, image_b64):
+        """Hand a snapshot to the image sender, replacing any frame still waiting."""
+        digest = hashlib.blake2b(image_b64.encode("ascii"), digest_size=8).digest()
+        try:
+            self._img_q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._img_q.put_nowait((image_b64, digest))
+        except queue.Full:
+            pass
+
+    def _image_sender_loop(self):
+        last_digest = None
+        while self.running:
+            try:
+                image_b64, digest = self._img_q.get(timeout=1.0)
+            except queue.Empty:
                 continue
-            if not self.mqtt_agent:
-                ok_all = False
+            if digest == last_digest:
                 continue
-            # Rate limit
-            if now - self.last_publish_time < self.publish_cooldown:
-                time.sleep(self.publish_cooldown)
-            if not self.mqtt_agent.send_to_adafruit_io(feed, val):
-                ok_all = False
-            self.last_publish_time = time.time()
-        return ok_all
+            if self.send_to_cloud({"image_b64": image_b64}, IMAGE_FEEDS):
+                last_digest = digest
+
+    # ---- Local logging ----
+    def _roll_log_date(self):
+        """Cache today's date key and the timestamp of the next local midnight."""
+        lt = time.localtime()
+        self._log_date = time.strftime("%Y-%m-%d", lt)
+        # mktime normalizes day overflow (Jan 32 -> Feb 1) and resolves DST itself
+        self._log_rollover = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+    def _log_record(self, name, record):
+        """Queue one JSON record for logs/<YYYY-MM-DD>_<name>.jsonl (newline added by the writer)."""
+        if time.time() >= self._log_rollover:
+            self._roll_log_date()
+        self._write_q.put((self._log_date, name, _dumps(record)))
+
+    def _writer_loop(self):
+        """Append queued lines grouped per file; fsync only at the flushing_interval boundary.
+
+        Handles are opened once per day with a 64 KiB buffer, so a flush window
+        collapses into a single write() per file. Records are packed into one
+        reused scratch buffer rather than joined into fresh bytes every batch.
+        """
+        handles, day = {}, None
+        scratch = bytearray(64 * 1024)
+        next_sync = time.monotonic() + self.flushing_interval
+        stop = False
+        while not stop:
+            try:
+                batch = [self._write_q.get(timeout=1.0)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < 256:
+                try:
+                    batch.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+
+            grouped = {}
+            for item in batch:
+                if item is None:
+                    stop = True
+                    continue
+                d, name, line = item
+                # keyed by date too: a batch spanning midnight keeps each line in its own day's file
+                grouped.setdefault((d, name), []).append(line)
+                day = d
+
+            for (d, name), lines in grouped.items():
+                try:
+                    fh = handles.get((d, name))
+                    if fh is None:
+                        fh = handles[(d, name)] = open(os.path.join(self.log_dir, f"{d}_{name}.jsonl"),
+                                                        "ab", buffering=64 * 1024)
+                    n = 0
+                    for line in lines:
+                        end = n + len(line) + 1
+                        if end > len(scratch):
+                            scratch.extend(bytes(max(end, 2 * len(scratch)) - len(scratch)))
+                        scratch[n:end - 1] = line
+                        scratch[end - 1] = 0x0A  # newline
+                        n = end
+                    with memoryview(scratch) as view:
+                        fh.write(view[:n])
+                except Exception as e:
+                    logger.warning(f"Log write failed for {name}: {e}")
+
+            # Day rollover: make the previous day's files durable, then retire their handles
+            stale = [key for key in handles if key[0] != day]
+            if stale:
+                old = [handles.pop(key) for key in stale]
+                self._sync_handles(old)
+                for fh in old:
+                    fh.close()
+
+            if stop or time.monotonic() >= next_sync:
+                self._sync_handles(list(handles.values()))
+                next_sync = time.monotonic() + self.flushing_interval
+
+        for fh in handles.values():
+            fh.close()
+
+    @staticmethod
+    def _sync_handles(handles):
+        """Flush every log handle, then make them durable with one syncfs (or fsync each)."""
+        for fh in handles:
+            try:
+                fh.flush()
+            except Exception as e:
+                logger.warning(f"Log flush failed: {e}")
+        if not handles:
+            return
+        if _syncfs is not None and _syncfs(handles[0].fileno()) == 0:
+            return
+        for fh in handles:
+            try:
+                os.fsync(fh.fileno())
+            except Exception as e:
+                logger.warning(f"Log fsync failed: {e}")
 
     # ---- Loop collectors ----
-    def collect_environmental_data(self, now, timers):
-        if self.env_data and now - timers['env_check'] >= self.env_interval:
+    def collect_environmental_data(self):
+        if self.env_data:
             env = self.env_data.get_environmental_data()
-            self.send_to_cloud(env, ENV_FEEDS)
-            timers['env_check'] = now
+            self._log_record("environmental_data", env)
+            self.send_to_cloud({"temperature": env.temperature, "humidity": env.humidity,
+                                "pressure": env.pressure}, ENV_FEEDS, self.env_group)
 
-    def collect_security_data(self, now, timers):
-        if self.security_data and now - timers['security_check'] >= self.security_check_interval:
+    def collect_security_data(self):
+        if self.security_data:
             sec = self.security_data.get_security_data()
+            # the archive keeps the ISO "timestamp" schema; the ns value is only the in-process form
+            record = {"timestamp": datetime.fromtimestamp(sec["timestamp_ns"] / 1e9).isoformat()}
+            record.update((k, v) for k, v in sec.items() if k not in ("timestamp_ns", "image_b64"))
+            self._log_record("motion_events", record)
             payload = {
                 "motion_detected": 1 if sec.get("motion_detected") else 0,
                 "led_status": sec.get("led_status"),
                 "buzzer_status": sec.get("buzzer_status"),
-                "image_b64": sec.get("image_b64"),
             }
-            self.send_to_cloud(payload, SECURITY_FEEDS)
-            timers['security_check'] = now
+            self.send_to_cloud(payload, SECURITY_FEEDS, self.security_group)
+            if sec.get("image_b64"):
+                self._queue_image(sec["image_b64"])
 
     # ---- Main data loop ----
-    def data_collection_loop(self):
-        timers = {'env_check': 0, 'security_check': 0}
+    def data_collection_loop(self, collect, interval):
+        # Deadlines on the monotonic clock: immune to NTP/wall-clock jumps, and the
+        # thread sleeps exactly until its collector is due again.
         while self.running:
-            now = time.time()
-            self.collect_security_data(now, timers)
-            self.collect_environmental_data(now, timers)
-            time.sleep(1)
+            next_run = time.monotonic() + interval
+            collect()
+            self._stop_evt.wait(max(0.0, next_run - time.monotonic()))
+
+    def _pin_threads(self, collectors):
+        """Keep the collection threads and the MQTT network thread on separate cores."""
+        if not self.pin_threads or not hasattr(os, "sched_setaffinity"):
+            return
+        cpus = sorted(os.sched_getaffinity(0))
+        if len(cpus) < 3:
+            return  # single/dual core (Pi Zero): leave scheduling to the kernel
+        try:
+            for t in collectors:
+                os.sched_setaffinity(t.native_id, {cpus[1]})
+            net = getattr(self.mqtt_agent, "_net_thread", None)
+            if net is not None and net.native_id is not None:
+                os.sched_setaffinity(net.native_id, {cpus[2]})
+        except OSError as e:
+            logger.warning(f"Thread pinning skipped: {e}")
+
+    def stop(self, *_):
+        """Signal handler: end the collection loop and wake any pending wait."""
+        if self.running:
+            logger.info("Stopping…")
+        self.running = False
+        self._stop_evt.set()
 
     def start(self):
         logger.info("Starting DomiSafe Loop")
-        thread = threading.Thread(target=self.data_collection_loop, daemon=True)
-        thread.start()
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        # One thread per collector so a slow motion tick (buzzer, camera, rate limit)
+        # never delays environmental readings, and vice versa.
+        threads = [
+            threading.Thread(target=self.data_collection_loop, name="domisafe-security",
+                             args=(self.collect_security_data, self.security_check_interval), daemon=True),
+            threading.Thread(target=self.data_collection_loop, name="domisafe-env",
+                             args=(self.collect_environmental_data, self.env_interval), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        self._pin_threads(threads)
         try:
-            while self.running:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            self.running = False
-            logger.info("Stopping…")
+            for thread in threads:
+                thread.join()
         finally:
-            thread.join()
-            if self.security_data and getattr(self.security_data, "_cam", None):
+            self._image_sender.join(timeout=2)
+            self._write_q.put(None)
+            self._writer.join(timeout=5)
+            cam = getattr(self.security_data, "_cam", None) if self.security_data else None
+            if cam is not None:
                 try:
-                    self.security_data._cam.stop()
+                    cam.stop()
                 except Exception:
-                    pass
+                    logger.exception("Camera stop failed")
             logger.info("Shutdown complete")
 
     # ---- Hardware test mode ----
@@ -131,7 +366,7 @@ class DomiSafeApp:
             self.security_data._set_led(False)
             self.security_data._set_buzzer(False)
             logger.info("Testing camera...")
-            img = self.security_data.capture_and_encode_image()
+            _, img = self.security_data.capture_and_encode_image()
             if img:
                 logger.info("Camera capture OK (encoded for Adafruit)")
             else:
@@ -139,10 +374,11 @@ class DomiSafeApp:
         if self.env_data:
             logger.info("Testing DHT11 sensor...")
             env = self.env_data.get_environmental_data()
-            logger.info(f"Temp={env['temperature']}°C  Humidity={env['humidity']}%  Pressure={env['pressure']} hPa")
+            logger.info(f"Temp={env.temperature}°C  Humidity={env.humidity}%  Pressure={env.pressure} hPa")
         logger.info("===== TEST COMPLETE =====")
 
 if __name__ == "__main__":
+    configure_logging()
     app = DomiSafeApp("config.json")
     # Quick hardware self-test before launching
     app.test_hardware()
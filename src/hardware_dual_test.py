@@ -1,23 +1,16 @@
 #!/usr/bin/env python3
 import time, logging
-from modules.config_loader import load_config
+from modules.config_loader import get_config
+from modules.motor_driver import MotorDriver
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
-# Try to load GPIO libs
-try:
-    import board, digitalio
-    GPIO_MODE = "adafruit"
-except Exception:
-    import RPi.GPIO as GPIO
-    GPIO_MODE = "rpi"
-
 def test_dht():
     print("\n🌡️  DHT11 SENSOR TEST")
     print("=======================")
     try:
-        import adafruit_dht
+        import board, adafruit_dht
         dht = adafruit_dht.DHT11(board.D4, use_pulseio=False)
         for i in range(10):
             try:
@@ -40,30 +33,19 @@ def test_dht():
 def test_motor():
     print("\n⚙️  MOTOR DRIVER TEST")
     print("=====================")
-    cfg = load_config("config.json")
+    cfg = get_config()
     pos_pin = int(cfg.get("MOTOR_POS_PIN", 20))
     neg_pin = int(cfg.get("MOTOR_NEG_PIN", 21))
-    print(f"Using GPIO {pos_pin} (POS) and {neg_pin} (NEG) | mode={GPIO_MODE}")
-
-    if GPIO_MODE == "adafruit":
-        pos = digitalio.DigitalInOut(getattr(board, f"D{pos_pin}"))
-        neg = digitalio.DigitalInOut(getattr(board, f"D{neg_pin}"))
-        pos.direction = digitalio.Direction.OUTPUT
-        neg.direction = digitalio.Direction.OUTPUT
-
-        def set_motor(fwd, rev):
-            pos.value = fwd
-            neg.value = rev
-            logger.info(f"POS={int(fwd)}  NEG={int(rev)}")
+    try:
+        motor = MotorDriver(pos_pin, neg_pin)
+    except Exception as e:
+        print(f"❌ Motor driver init failed: {e}")
+        return False
+    print(f"Using GPIO {pos_pin} (POS) and {neg_pin} (NEG) | mode={motor.mode}")
 
-    else:
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(pos_pin, GPIO.OUT)
-        GPIO.setup(neg_pin, GPIO.OUT)
-        def set_motor(fwd, rev):
-            GPIO.output(pos_pin, fwd)
-            GPIO.output(neg_pin, rev)
-            logger.info(f"POS={int(fwd)}  NEG={int(rev)}")
+    def set_motor(fwd, rev):
+        motor.set(fwd, rev)
+        logger.info(f"POS={int(fwd)}  NEG={int(rev)}")
 
     try:
         print("➡️  Forward spin (2s)...")
@@ -80,8 +62,7 @@ def test_motor():
 
         print("⏹️  Stop.")
         set_motor(False, False)
-        if GPIO_MODE != "adafruit":
-            GPIO.cleanup()
+        motor.close()
         print("✅ Motor GPIO toggled successfully.")
         print("If motor didn’t move, verify:")
         print("  • Driver has external power (e.g., 9–12 V)")
@@ -90,8 +71,7 @@ def test_motor():
         return True
     except Exception as e:
         print(f"❌ Motor test error: {e}")
-        if GPIO_MODE != "adafruit":
-            GPIO.cleanup()
+        motor.close()
         return False
 
 def main():
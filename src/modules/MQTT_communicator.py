@@ -1,31 +1,96 @@
+import json
 import logging
+import ssl
 import threading
 import uuid
-import time
-from typing import Any, Optional
+from typing import Any, Collection, Dict, Optional, Union
 import paho.mqtt.client as mqtt
-from modules.config_loader import load_config
+from modules._logging import logger_for
+from modules.config_loader import resolve_config
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except Exception:
+    orjson = None  # type: ignore
+    _dumps = json.dumps
 
 # -------------------------------------------------------------------
 # Logging
 # -------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger(__name__)
+logger = logger_for(__name__)
+
+_NULL_PAYLOAD = b"null"
+
+
+def _payload(value: Any) -> bytes:
+    """Wire bytes for one feed value, so paho takes its bytes path instead of encoding a str."""
+    if value is None:
+        return _NULL_PAYLOAD
+    if isinstance(value, (bytes, bytearray)):
+        return value
+    return str(value).encode()
+
+
+class _ResumingSSLContext(ssl.SSLContext):
+    """SSLContext that offers the last TLS session on each new socket (1-RTT resumption)."""
+
+    session: Optional[ssl.SSLSession] = None
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        if self.session is not None and kwargs.get("session") is None:
+            kwargs["session"] = self.session
+        return super().wrap_socket(sock, *args, **kwargs)
 
 
 class MQTT_communicator:
     """Stable Adafruit IO MQTT client (TLS enforced, port 8883)."""
 
-    def __init__(self, config_file: str = "config.json"):
-        self.config = load_config(config_file)
+    _ssl_ctx: Optional[_ResumingSSLContext] = None
+    _instance: Optional["MQTT_communicator"] = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, config: Union[str, Dict[str, Any]] = "config.json") -> "MQTT_communicator":
+        """Process-wide client so every module shares one TLS connection and network thread.
+
+        The config is only used by the first call, which creates the instance.
+        """
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(config)
+        return cls._instance
+
+    @classmethod
+    def _tls_context(cls) -> _ResumingSSLContext:
+        """Build the TLS context once; every client and reconnect shares it and its session."""
+        if cls._ssl_ctx is None:
+            ctx = _ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            ctx.load_default_certs()
+            ctx.options &= ~ssl.OP_NO_TICKET
+            cls._ssl_ctx = ctx
+        return cls._ssl_ctx
+
+    def __init__(self, config: Union[str, Dict[str, Any]] = "config.json"):
+        self.config = resolve_config(config)
         self.mqtt_client: Optional[mqtt.Client] = None
+        self._net_thread: Optional[threading.Thread] = None
         self.mqtt_connected = False
-        self._connected_event = threading.Event()
+        self._connected_event = threading.Event()  # set on any CONNACK, used by setup_mqtt
+        self.connected_evt = threading.Event()     # set only while the broker session is up
         self.reconnect_attempts = 0
         self._use_tls = True  # always use TLS for Adafruit IO
+        # resolved once; setup_mqtt and reconnects read these instead of the config mapping
+        self._host = self.config.get("MQTT_BROKER", "io.adafruit.com")
+        self._port = int(self.config.get("MQTT_PORT", 8883))  # TLS port
+        self._keepalive = int(self.config.get("MQTT_KEEPALIVE", 60))
+        self._user = str(self.config.get("ADAFRUIT_IO_USERNAME", "")).strip()
+        self._key = str(self.config.get("ADAFRUIT_IO_KEY", "")).strip()
+        self._client_id = self.config.get("MQTT_CLIENT_ID", None)
+        self._topic_prefix = f"{self._user}/feeds/"
+        self._group_prefix = f"{self._user}/groups/"
+        self._topics: Dict[str, str] = {}  # feed name -> full topic, filled on first use
         self.setup_mqtt()
 
     # -------------------------------------------------------------------
@@ -36,13 +101,10 @@ class MQTT_communicator:
 
     # -------------------------------------------------------------------
     def setup_mqtt(self):
-        host = self.config.get("MQTT_BROKER", "io.adafruit.com")
-        port = int(self.config.get("MQTT_PORT", 8883))  # TLS port
-        keepalive = int(self.config.get("MQTT_KEEPALIVE", 60))
-        user = str(self.config.get("ADAFRUIT_IO_USERNAME", "")).strip()
-        key = str(self.config.get("ADAFRUIT_IO_KEY", "")).strip()
+        host, port, keepalive = self._host, self._port, self._keepalive
+        user, key = self._user, self._key
 
-        cfg_client_id = self.config.get("MQTT_CLIENT_ID", None)
+        cfg_client_id = self._client_id
         if cfg_client_id is None:
             self.mqtt_client = self._create_client()
         elif isinstance(cfg_client_id, str) and cfg_client_id == "":
@@ -51,6 +113,7 @@ class MQTT_communicator:
             self.mqtt_client = mqtt.Client(client_id=str(cfg_client_id), protocol=mqtt.MQTTv311)
 
         self.mqtt_client.username_pw_set(user, key)
+        self.mqtt_client.reconnect_delay_set(min_delay=1, max_delay=60)
 
         try:
             self.mqtt_client.enable_logger(logger)
@@ -59,16 +122,19 @@ class MQTT_communicator:
             self.mqtt_client.on_publish = self.on_publish
 
             # Force TLS for Adafruit IO
-            self.config["MQTT_PORT"] = 8883
-            logger.info(f"🔒 Forcing TLS connection to {host}:8883")
-            self.mqtt_client.tls_set()
+            logger.info("🔒 Forcing TLS connection to %s:8883", host)
+            self.mqtt_client.tls_set_context(self._tls_context())
 
             masked_key = f"{key[:4]}…{key[-4:]}" if len(key) >= 8 else "****"
-            logger.info(f"MQTT config: user={user!r}, key_mask={masked_key}, host={host!r}, port={port}")
+            logger.info("MQTT config: user=%r, key_mask=%s, host=%r, port=%s", user, masked_key, host, port)
 
-            # Connect securely
-            self.mqtt_client.connect(host, port, keepalive)
+            # Connect securely; loop_start's single network thread does the connect and every
+            # reconnect, so a broker that's down at boot is retried instead of raising here.
+            # It must be paho's own thread: with client._thread unset, publish() writes the
+            # socket from the caller's thread and races the network loop.
+            self.mqtt_client.connect_async(host, port, keepalive)
             self.mqtt_client.loop_start()
+            self._net_thread = self.mqtt_client._thread  # kept for CPU pinning
 
             if self._connected_event.wait(timeout=10.0) and self.mqtt_connected:
                 logger.info("✅ Connected securely to Adafruit IO MQTT (TLS 8883)")
@@ -76,17 +142,20 @@ class MQTT_communicator:
                 raise RuntimeError("MQTT connection timeout")
 
         except Exception as e:
-            logger.error(f"❌ MQTT setup failed: {e}")
+            logger.error("❌ MQTT setup failed: %s", e)
             self.mqtt_connected = False
 
     # -------------------------------------------------------------------
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self.mqtt_connected = True
+            self.connected_evt.set()
             self.reconnect_attempts = 0
+            self._save_tls_session(client)
             logger.info("✅ Connected to Adafruit IO MQTT broker (TLS).")
         else:
             self.mqtt_connected = False
+            self.connected_evt.clear()
             reasons = {
                 1: "Unacceptable protocol version",
                 2: "Identifier rejected",
@@ -95,62 +164,108 @@ class MQTT_communicator:
                 5: "Not authorized"
             }
             reason = reasons.get(rc, f"Unknown code {rc}")
-            logger.error(f"❌ Connection failed (rc={rc}): {reason}")
+            logger.error("❌ Connection failed (rc=%s): %s", rc, reason)
 
         self._connected_event.set()
 
+    # -------------------------------------------------------------------
+    def _save_tls_session(self, client):
+        """Keep the negotiated TLS session so the next connect can resume it."""
+        try:
+            sock = client.socket()
+            if isinstance(sock, ssl.SSLSocket) and sock.session is not None:
+                self._tls_context().session = sock.session
+                logger.debug("TLS session cached (reused=%s)", sock.session_reused)
+        except Exception as e:
+            logger.debug("TLS session not cached: %s", e)
+
     # -------------------------------------------------------------------
     def on_disconnect(self, client, userdata, rc):
         self.mqtt_connected = False
-        logger.warning(f"Disconnected (rc={rc})")
-
+        self.connected_evt.clear()
         if rc != 0:
-            time.sleep(2)
-            logger.info("Attempting reconnection...")
-            self.reconnect()
+            # paho's loop thread reconnects on its own, backing off per reconnect_delay_set
+            self.reconnect_attempts += 1
+            logger.warning("Disconnected (rc=%s); paho will reconnect (attempt %d)", rc, self.reconnect_attempts)
+        else:
+            logger.warning("Disconnected (rc=%s)", rc)
 
     # -------------------------------------------------------------------
-    def reconnect(self):
-        try:
-            port = int(self.config.get("MQTT_PORT", 8883))
-            host = self.config.get("MQTT_BROKER", "io.adafruit.com")
-            self._connected_event.clear()
-            self.mqtt_client = self._create_client()
-            user = str(self.config.get("ADAFRUIT_IO_USERNAME", "")).strip()
-            key = str(self.config.get("ADAFRUIT_IO_KEY", "")).strip()
-            self.mqtt_client.username_pw_set(user, key)
-            self.mqtt_client.enable_logger(logger)
-            self.mqtt_client.on_connect = self.on_connect
-            self.mqtt_client.on_disconnect = self.on_disconnect
-            self.mqtt_client.on_publish = self.on_publish
-            self.mqtt_client.tls_set()
-            self.mqtt_client.connect(host, port, 60)
-            self.mqtt_client.loop_start()
-            logger.info("🔁 Reconnection attempt started.")
-        except Exception as e:
-            logger.error(f"❌ Reconnection failed: {e}")
+    def on_publish(self, client, userdata, mid):
+        logger.debug("Message %d published successfully.", mid)
 
     # -------------------------------------------------------------------
-    def on_publish(self, client, userdata, mid):
-        logger.debug(f"Message {mid} published successfully.")
+    def _topic(self, feed_name: str) -> str:
+        topic = self._topics.get(feed_name)
+        if topic is None:
+            topic = self._topics[feed_name] = self._topic_prefix + feed_name
+        return topic
 
     # -------------------------------------------------------------------
-    def send_to_adafruit_io(self, feed_name: str, value: Any) -> bool:
+    def send_to_adafruit_io(self, feed_name: str, value: Any, retain: bool = False) -> bool:
+        """Publish one value at QoS 0; retain=True lets the broker hold the last status."""
         if not self.mqtt_client or not self.mqtt_connected:
             logger.warning("⚠️ MQTT not connected – skipping publish.")
             return False
 
-        topic = f"{self.config['ADAFRUIT_IO_USERNAME']}/feeds/{feed_name}"
-        payload = "null" if value is None else str(value)
+        topic = self._topic(feed_name)
 
         try:
-            info = self.mqtt_client.publish(topic, payload)
+            info = self.mqtt_client.publish(topic, _payload(value), qos=0, retain=retain)
             if info.rc == mqtt.MQTT_ERR_SUCCESS:
-                logger.info(f"📤 Sent to {feed_name}: {payload}")
+                logger.info("📤 Sent to %s: %s", feed_name, value)
                 return True
             else:
-                logger.error(f"Publish failed (rc={info.rc}) for feed {feed_name}")
+                logger.error("Publish failed (rc=%s) for feed %s", info.rc, feed_name)
                 return False
         except Exception as e:
-            logger.error(f"MQTT publish exception: {e}")
-            return False
\ No newline at end of file
+            logger.error("MQTT publish exception: %s", e)
+            return False
+
+    # -------------------------------------------------------------------
+    def send_many(self, feeds: Dict[str, Any], retained: Collection[str] = ()) -> int:
+        """Publish several feeds back-to-back in one tight loop; returns how many were queued.
+
+        All messages are QoS 0 and handed to paho without waiting in between, so the
+        network thread can coalesce them into as few TLS records as possible.
+        Confirmation is asynchronous via on_publish. Feeds named in `retained` are
+        published with the retain flag.
+        """
+        if not self.mqtt_client or not self.mqtt_connected:
+            logger.warning("⚠️ MQTT not connected – skipping publish.")
+            return 0
+
+        sent = 0
+        for feed_name, value in feeds.items():
+            try:
+                info = self.mqtt_client.publish(self._topic(feed_name), _payload(value), qos=0,
+                                                retain=feed_name in retained)
+            except Exception as e:
+                logger.error("MQTT publish exception: %s", e)
+                continue
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                logger.info("📤 Sent to %s: %s", feed_name, value)
+                sent += 1
+            else:
+                logger.error("Publish failed (rc=%s) for feed %s", info.rc, feed_name)
+        return sent
+
+    # -------------------------------------------------------------------
+    def publish_group(self, group: str, values: Dict[str, Any]) -> bool:
+        """Update several feeds of an Adafruit IO group with one JSON message."""
+        if not self.mqtt_client or not self.mqtt_connected:
+            logger.warning("⚠️ MQTT not connected – skipping publish.")
+            return False
+
+        topic = self._group_prefix + group + "/json"
+        try:
+            info = self.mqtt_client.publish(topic, _dumps({"feeds": values}), qos=0)
+        except Exception as e:
+            logger.error("MQTT publish exception: %s", e)
+            return False
+        if info.rc == mqtt.MQTT_ERR_SUCCESS:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("📤 Sent to group %s: %s", group, ", ".join(values))
+            return True
+        logger.error("Publish failed (rc=%s) for group %s", info.rc, group)
+        return False
@@ -0,0 +1,16 @@
+# modules/_clock.py
+"""Cached wall-clock timestamps shared by the sensor modules."""
+import time
+
+_cache = (-1, "")  # (epoch second, ISO string); swapped as one tuple so threads never see a torn pair
+
+
+def now_iso() -> str:
+    """ISO-8601 local time at second resolution, formatted only when the second changes."""
+    global _cache
+    sec = int(time.time())
+    cached_sec, iso = _cache
+    if sec != cached_sec:
+        iso = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        _cache = (sec, iso)
+    return iso
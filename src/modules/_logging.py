@@ -0,0 +1,36 @@
+# modules/_logging.py
+"""Process-wide logging setup for the DomiSafe app; entry points call configure_logging().
+
+Records go through a QueueHandler on the root logger and a QueueListener thread
+does the actual stream writes, so logging from the sensor and MQTT threads never
+blocks on stderr.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> None:
+    """Install the queue-backed root handler once; a no-op if logging is already configured."""
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        # the entry script configured logging itself; leave it alone
+        return
+    logging.basicConfig(level=logging.INFO, format=_FORMAT)
+    sinks = root.handlers[:]
+    log_q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root.handlers = [logging.handlers.QueueHandler(log_q)]
+    _listener = logging.handlers.QueueListener(log_q, *sinks, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def logger_for(name: str) -> logging.Logger:
+    """Module logger; output follows whatever the entry script configured."""
+    return logging.getLogger(name)
@@ -1,10 +1,19 @@
 # modules/config_loader.py
+import functools
 import json
 import os
-import logging
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Union
+from modules._logging import logger_for
 
-logger = logging.getLogger(__name__)
+try:
+    import orjson
+    _loads = orjson.loads
+except Exception:
+    orjson = None  # type: ignore
+    _loads = json.loads
+
+logger = logger_for(__name__)
 
 DEFAULTS: Dict[str, object] = {
     "ADAFRUIT_IO_USERNAME": "username",
@@ -16,9 +25,23 @@ DEFAULTS: Dict[str, object] = {
     "MQTT_KEEPALIVE": 60,
     # Prefer TCP, will fallback to websockets in code; allow override
     "MQTT_TRANSPORT": "tcp",
+    # Publish pacing (token bucket shared by all feeds); MAX_PUBLISHES_PER_SEC <= 0 disables it
+    "MAX_PUBLISHES_PER_SEC": 0.5,
+    "PUBLISH_BURST": 4,
+    # Adafruit IO group keys (e.g. "domisafe-env"); None keeps per-feed publishing
+    "ENV_GROUP": None,
+    "SECURITY_GROUP": None,
+    # Seconds before an unchanged status feed (LED/buzzer/image) is re-sent anyway
+    "STATUS_RESYNC_INTERVAL": 60,
+    # Pin the collection and MQTT network threads to separate cores (Linux, >= 3 CPUs)
+    "PIN_THREADS": True,
 
     # App timings
     "camera_enabled": True,
+    # Snapshots as mono JPEGs straight from the Y plane (false: colour via YUV->BGR)
+    "CAMERA_GRAYSCALE": True,
+    # Include the base64 snapshot in security data (needed for the camera feed)
+    "RETURN_ENCODED": True,
     "security_check_interval": 5,
     "env_interval": 30,
     "flushing_interval": 10,
@@ -33,8 +56,46 @@ DEFAULTS: Dict[str, object] = {
     "MOTOR_NEG_PIN": 21,
 }
 
-def load_config(path: str = "config.json", defaults: Optional[Dict[str, object]] = None) -> Dict[str, object]:
-    """Load JSON config and merge with defaults. Pull ADAFRUIT_IO_KEY from ENV if present."""
+@functools.lru_cache(maxsize=8)
+def _read_config_file(path: str, mtime: float) -> Optional[Mapping[str, object]]:
+    """Parse one config file. Keyed on mtime, so an edited file is read again.
+
+    The cached result is shared by every caller, so it is returned read-only.
+    """
+    try:
+        with open(path, "rb") as f:
+            file_cfg = _loads(f.read()) or {}
+        if not isinstance(file_cfg, dict):
+            raise ValueError(f"expected a JSON object, got {type(file_cfg).__name__}")
+        # uppercase keys in place rather than building a second dict
+        for k in list(file_cfg):
+            if not k.isupper():
+                file_cfg[k.upper()] = file_cfg.pop(k)
+    except Exception as e:
+        logger.warning(f"Failed reading config {path}: {e}")
+        return None
+    logger.info(f"Loaded config from {path}")
+    return MappingProxyType(file_cfg)
+
+
+@functools.lru_cache(maxsize=8)
+def _log_credentials(user: object, masked: str, src_user: str, src_key: str, weak_key: bool) -> None:
+    """Log the credential summary once per distinct result rather than on every load."""
+    logger.info(
+        f"ADAFRUIT_IO_USERNAME={user} (source={src_user}) | "
+        f"ADAFRUIT_IO_KEY={masked} (source={src_key})"
+    )
+    # Extra diagnostics: warn if key looks like a default/placeholder or is very short
+    if weak_key:
+        logger.warning("ADAFRUIT_IO_KEY appears to be missing or too short; verify config.json or ADAFRUIT_IO_KEY env var")
+
+
+def load_config(path: str = "config.json", defaults: Optional[Dict[str, object]] = None) -> Mapping[str, object]:
+    """Load JSON config and merge with defaults. Pull ADAFRUIT_IO_KEY from ENV if present.
+
+    The parsed file is cached per (path, mtime); env overrides are applied on every
+    call. The result is read-only because callers share the cached values.
+    """
     base = dict(defaults or DEFAULTS)
     loaded = False
     search_paths = []
@@ -49,18 +110,16 @@ def load_config(path: str = "config.json", defaults: Optional[Dict[str, object]]
         pass
 
     for candidate in search_paths:
+        candidate = os.path.abspath(candidate)
         try:
-            with open(candidate, "r") as f:
-                file_cfg = json.load(f)
-                file_cfg = {k.upper(): v for k, v in file_cfg.items()}
-                base.update(file_cfg or {})
-                logger.info(f"Loaded config from {os.path.abspath(candidate)}")
-                loaded = True
-                break
-        except FileNotFoundError:
+            mtime = os.stat(candidate).st_mtime
+        except OSError:
             continue
-        except Exception as e:
-            logger.warning(f"Failed reading config {candidate}: {e}")
+        file_cfg = _read_config_file(candidate, mtime)
+        if file_cfg is not None:
+            base.update(file_cfg)
+            loaded = True
+            break
 
     if not loaded:
         logger.warning(f"Config file {path} not found; using defaults only")
@@ -89,21 +148,29 @@ def load_config(path: str = "config.json", defaults: Optional[Dict[str, object]]
         except Exception:
             return "****"
 
-    try:
-        masked = _mask(str(base.get("ADAFRUIT_IO_KEY", "")))
-        logger.info(
-            f"ADAFRUIT_IO_USERNAME={base.get('ADAFRUIT_IO_USERNAME')} (source={src_user}) | "
-            f"ADAFRUIT_IO_KEY={masked} (source={src_key})"
-        )
-    except Exception:
-        pass
-
-    # Extra diagnostics: warn if key looks like a default/placeholder or is very short
     try:
         key_val = str(base.get("ADAFRUIT_IO_KEY", ""))
-        if key_val in ("userkey", "", None) or len(key_val) < 10:
-            logger.warning("ADAFRUIT_IO_KEY appears to be missing or too short; verify config.json or ADAFRUIT_IO_KEY env var")
+        weak_key = key_val in ("userkey", "") or len(key_val) < 10
+        _log_credentials(str(base.get("ADAFRUIT_IO_USERNAME")), _mask(key_val), src_user, src_key, weak_key)
     except Exception:
         pass
 
-    return base
+    return MappingProxyType(base)
+
+
+_CONFIG: Optional[Mapping[str, object]] = None
+
+
+def get_config() -> Mapping[str, object]:
+    """Process-wide config.json, loaded on first call and shared by every later caller."""
+    global _CONFIG
+    if _CONFIG is None:
+        _CONFIG = load_config("config.json")
+    return _CONFIG
+
+
+def resolve_config(config: Union[str, Mapping[str, object]] = "config.json") -> Mapping[str, object]:
+    """Return an already-loaded config as-is, or load it when given a path."""
+    if isinstance(config, str):
+        return load_config(config)
+    return config
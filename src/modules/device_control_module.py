@@ -1,24 +1,26 @@
 # device_control_module.py
-import json, logging
-from datetime import datetime
-from modules.config_loader import load_config
+import json
+from modules._clock import now_iso
+from modules._logging import logger_for
+from modules.config_loader import resolve_config
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+logger = logger_for(__name__)
 
 class device_control_module:
-    def __init__(self, config_file='config.json'):
-        self.config = load_config(config_file)
+    def __init__(self, config='config.json'):
+        self.config = resolve_config(config)
+        self._device_names = ()
         try:
-            devices = self.config.get('devices', ["living_room_light", "bedroom_fan"])
-            logger.info(f"Device control configured for devices: {devices}")
+            self._device_names = tuple(self.config.get('devices', ["living_room_light", "bedroom_fan"]))
+            logger.info(f"Device control configured for devices: {list(self._device_names)}")
         except Exception:
             logger.debug("Device control: unable to read devices from config")
+        # Device list and status are static; only the timestamp changes per request
+        self._status_template = [{'device_name': d, 'status': 'off'} for d in self._device_names]
 
     def generate_device_status(self):
-        devices = self.config.get('devices', ["living_room_light", "bedroom_fan"])
-        now = datetime.now().isoformat()
-        return [{'timestamp': now, 'device_name': d, 'status': 'off'} for d in devices]
+        now = now_iso()
+        return [{'timestamp': now, **s} for s in self._status_template]
 
     def get_device_status(self):
         try:
@@ -1,10 +1,12 @@
 # environmental_module.py
-import logging, time, math, random
-from datetime import datetime
-from modules.config_loader import load_config
+import time, math, random
+from dataclasses import dataclass
+from typing import Optional
+from modules._clock import now_iso
+from modules._logging import logger_for
+from modules.config_loader import resolve_config
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+logger = logger_for(__name__)
 
 # Best effort import; fall back to "no sensor" mode
 try:
@@ -15,12 +17,41 @@ except Exception:
     _HAS_DHT = False
     board = adafruit_dht = None  # type: ignore
 
+# NumPy (pulled in by opencv/picamera2) pre-draws sim noise in batches when present
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_SIM_BATCH = 1024
+
+
+@dataclass(frozen=True)
+class EnvSample:
+    """One environmental reading; None fields are published as 'null'."""
+    # spelled out rather than dataclass(slots=True), which needs Python 3.10 (Bullseye ships 3.9)
+    __slots__ = ("timestamp", "temperature", "humidity", "pressure")
+
+    timestamp: str
+    temperature: Optional[float]
+    humidity: Optional[float]
+    pressure: Optional[float]
+
+
+# Simulated temperature swing, 5*sin(t/3600), sampled once per minute over one full
+# period so each sim reading is a list index instead of a libm call
+_SIN_STEP = 60
+_SIN_LUT = [5 * math.sin(i * _SIN_STEP / 3600) for i in range(round(2 * math.pi * 3600 / _SIN_STEP))]
+
 class environmental_module:
     """Returns temperature/humidity/pressure. If sensor not present, returns None (published as 'null')."""
 
-    def __init__(self, config_file='config.json'):
-        self.config = load_config(config_file)
+    def __init__(self, config='config.json'):
+        self.config = resolve_config(config)
         self._dht = None
+        self._sim_buf = None
+        self._sim_idx = 0
+        self._sim_rng = np.random.default_rng() if np is not None else None
         if _HAS_DHT:
             try:
                 # Allow the DHT pin to be configured via config (DHT_PIN).
@@ -36,7 +67,24 @@ class environmental_module:
                 logger.warning(f"DHT init failed, switching to null/sim mode: {e}")
                 self._dht = None
 
-    def get_environmental_data(self):
+    def _sim_noise(self):
+        """Next (temperature noise, humidity noise, pressure) sim triple, served from a pre-drawn batch."""
+        if self._sim_rng is None:
+            return random.uniform(-2, 2), random.uniform(-5, 5), round(1013.25 + random.uniform(-10, 10), 2)
+        if self._sim_buf is None or self._sim_idx >= _SIM_BATCH:
+            rng = self._sim_rng
+            self._sim_buf = (
+                rng.uniform(-2, 2, _SIM_BATCH).tolist(),
+                rng.uniform(-5, 5, _SIM_BATCH).tolist(),
+                np.round(1013.25 + rng.uniform(-10, 10, _SIM_BATCH), 2).tolist(),
+            )
+            self._sim_idx = 0
+        i = self._sim_idx
+        self._sim_idx = i + 1
+        temps, hums, press = self._sim_buf
+        return temps[i], hums[i], press[i]
+
+    def get_environmental_data(self) -> EnvSample:
         temperature_c = None
         humidity = None
         pressure = None  # DHT11 has no pressure; we keep it for your existing feed (sim/baseline)
@@ -48,20 +96,12 @@ class environmental_module:
             except Exception as e:
                 logger.warning(f"DHT read error: {e}; returning nulls")
         else:
-            # If you prefer to simulate instead of nulls, uncomment next lines:
-            base = 22 + 5 * math.sin(time.time() / 3600)
-            temperature_c = round(base + random.uniform(-2, 2), 1)
-            humidity = max(30, min(90, round(60 - (temperature_c - 20) * 2 + random.uniform(-5, 5), 1)))
-            pressure = round(1013.25 + random.uniform(-10, 10), 2)
-            # temperature_c = None
-            # humidity = None
-            # pressure = None
+            # No sensor: simulate readings
+            base = 22 + _SIN_LUT[int(time.time() // _SIN_STEP) % len(_SIN_LUT)]
+            t_noise, h_noise, pressure = self._sim_noise()
+            temperature_c = round(base + t_noise, 1)
+            humidity = max(30, min(90, round(60 - (temperature_c - 20) * 2 + h_noise, 1)))
 
-        result = {
-            'timestamp': datetime.now().isoformat(),
-            'temperature': temperature_c,
-            'humidity': humidity,
-            'pressure': pressure
-        }
-        logger.debug(f"Environmental data: {result}")
+        result = EnvSample(now_iso(), temperature_c, humidity, pressure)
+        logger.debug("Environmental data: %s", result)
         return result
@@ -0,0 +1,81 @@
+# modules/motor_driver.py
+"""Motor output on POS/NEG pins (or a single control pin), GPIO backend chosen once."""
+from typing import Callable, Optional
+
+try:
+    import board, digitalio
+    GPIO_MODE = "adafruit"
+except Exception:
+    try:
+        import RPi.GPIO as GPIO
+        GPIO_MODE = "rpi"
+    except Exception:
+        GPIO_MODE = None
+
+
+class MotorDriver:
+    """forward/backward/stop for a driver wired to pos_pin/neg_pin; neg_pin=None for single-pin control.
+
+    The pin writer is picked at construction, so each toggle is one call with no
+    GPIO-mode branching.
+    """
+
+    def __init__(self, pos_pin: int, neg_pin: Optional[int] = None):
+        self.pos_pin = pos_pin
+        self.neg_pin = neg_pin
+        self.mode = GPIO_MODE
+        self._pins = [p for p in (pos_pin, neg_pin) if p is not None]
+        self._ios = []
+        self._w = self._pick_writer()
+
+    def _pick_writer(self) -> Callable[[int, int], None]:
+        if GPIO_MODE == "adafruit":
+            for p in self._pins:
+                io = digitalio.DigitalInOut(getattr(board, f"D{p}"))
+                io.direction = digitalio.Direction.OUTPUT
+                self._ios.append(io)
+            if len(self._ios) == 2:
+                pos, neg = self._ios
+
+                def write(a, b):
+                    pos.value = bool(a)
+                    neg.value = bool(b)
+            else:
+                pos = self._ios[0]
+
+                def write(a, b):
+                    pos.value = bool(a)
+            return write
+
+        if GPIO_MODE == "rpi":
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(self._pins, GPIO.OUT)
+            if self.neg_pin is not None:
+                pins = (self.pos_pin, self.neg_pin)
+                return lambda a, b: GPIO.output(pins, (a, b))
+            pin = self.pos_pin
+            return lambda a, b: GPIO.output(pin, a)
+
+        raise RuntimeError("No GPIO library available (install adafruit-blinka or RPi.GPIO)")
+
+    def set(self, pos: int, neg: int = 0):
+        self._w(pos, neg)
+
+    def forward(self):
+        self._w(1, 0)
+
+    def backward(self):
+        self._w(0, 1)
+
+    def stop(self):
+        self._w(0, 0)
+
+    def close(self):
+        """Stop the motor and release the pins."""
+        try:
+            self.stop()
+        finally:
+            if GPIO_MODE == "rpi":
+                GPIO.cleanup(self._pins)
+            for io in self._ios:
+                io.deinit()
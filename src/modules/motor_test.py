@@ -1,19 +1,49 @@
-import time, RPi.GPIO as GPIO, json
+import os, sys, time
 
-with open("../../config.json") as f:
-    cfg = json.load(f)
-pin = cfg.get("MOTOR_PIN", 21)
+# run as a script from src/modules: make the `modules` package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.config_loader import get_config
 
+try:
+    import pigpio
+except Exception:
+    pigpio = None
+
+HW_PWM_PINS = (12, 13, 18, 19)  # GPIOs wired to the PWM peripheral
+
+cfg = get_config()
+pin = int(cfg.get("MOTOR_PIN", 21))
 print(f"Testing motor on GPIO{pin}")
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(pin, GPIO.OUT)
 
-GPIO.output(pin, GPIO.HIGH)
-print("Motor ON for 3s")
-time.sleep(3)
-GPIO.output(pin, GPIO.LOW)
-print("Motor OFF")
+pi = pigpio.pi() if pigpio else None
+if pi is not None and pi.connected:
+    # pigpiod times the pin with DMA, so duty cycles don't depend on Python scheduling
+    pi.set_mode(pin, pigpio.OUTPUT)
+    pi.write(pin, 1)
+    print("Motor ON for 3s")
+    time.sleep(3)
+
+    print("Motor 50% PWM @ 1kHz for 3s")
+    if pin in HW_PWM_PINS:
+        pi.hardware_PWM(pin, 1000, 500000)
+    else:
+        pi.set_PWM_frequency(pin, 1000)
+        pi.set_PWM_dutycycle(pin, 128)
+    time.sleep(3)
+
+    pi.write(pin, 0)
+    print("Motor OFF")
+    pi.stop()
+else:
+    import RPi.GPIO as GPIO
+    print("pigpiod not available; using RPi.GPIO")
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(pin, GPIO.OUT)
 
-GPIO.cleanup(pin)
+    GPIO.output(pin, GPIO.HIGH)
+    print("Motor ON for 3s")
+    time.sleep(3)
+    GPIO.output(pin, GPIO.LOW)
+    print("Motor OFF")
 
-    
\ No newline at end of file
+    GPIO.cleanup(pin)
@@ -1,57 +1,139 @@
-import logging, os, time, threading, base64
+import os, time, threading, queue, mmap, struct, select
 from datetime import datetime
-from modules.config_loader import load_config
+from typing import Optional
+from modules._logging import logger_for
+from modules.config_loader import resolve_config
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
-logger = logging.getLogger(__name__)
+logger = logger_for(__name__)
 
 # --- Try hardware modes ---
+_HW_ERROR = None
 try:
     import board, digitalio
-    from picamera2 import Picamera2
-    import cv2
+    from picamera2 import Picamera2, MappedArray
     GPIO_MODE = "adafruit"
     _HW = True
 except Exception:
     try:
-        from gpiozero import LED, Buzzer, MotionSensor, Motor
-        from picamera2 import Picamera2
+        from gpiozero import LED, Buzzer, TonalBuzzer, MotionSensor, Motor
+        from gpiozero.tones import Tone
+        from picamera2 import Picamera2, MappedArray
         GPIO_MODE = "gpiozero"
         _HW = True
     except Exception as e:
-        logger.warning(f"No GPIO libs ({e}); mock mode.")
+        # reported by security_module(), once the entry script has set up logging
+        _HW_ERROR = e
         GPIO_MODE = "mock"
         _HW = False
 
+try:
+    import cv2
+    _HAVE_CV2 = True
+    _JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+except ImportError:
+    cv2 = None
+    _HAVE_CV2 = False
+    _JPEG_PARAMS = []
+
+# pybase64 encodes with SIMD (NEON on the Pi 4/5); same b64encode API as the stdlib
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+# Polled PIR debounce: a high read must hold for _PIR_VOTES of _PIR_SAMPLES reads 20 ms apart
+_PIR_SAMPLES, _PIR_VOTES, _PIR_SAMPLE_S = 5, 3, 0.02
+
+# Snapshot stream size (width, height)
+LORES_SIZE = (640, 480)
+
+# BCM283x/BCM2711 GPIO block: GPSET0 / GPCLR0 register offsets in /dev/gpiomem
+_GPSET0, _GPCLR0 = 0x1C, 0x28
+_REG = struct.Struct("<I")
+_BCM_SOCS = (b"brcm,bcm2835", b"brcm,bcm2836", b"brcm,bcm2837", b"brcm,bcm2711")
+
+
+def _open_gpiomem():
+    """mmap the GPIO registers, or None where the BCM283x layout doesn't apply (mock, Pi 5)."""
+    try:
+        with open("/proc/device-tree/compatible", "rb") as f:
+            if not any(soc in f.read() for soc in _BCM_SOCS):
+                return None
+        fd = os.open("/dev/gpiomem", os.O_RDWR | os.O_SYNC)
+        try:
+            return mmap.mmap(fd, 4096)
+        finally:
+            os.close(fd)
+    except Exception as e:
+        logger.debug(f"/dev/gpiomem unavailable: {e}")
+        return None
+
+
+def _sysfs_gpio_base():
+    """sysfs number of BCM GPIO0 (0 on older kernels, 512 on 6.6+); raises if there is no BCM chip."""
+    for chip in os.listdir("/sys/class/gpio"):
+        if chip.startswith("gpiochip"):
+            with open(f"/sys/class/gpio/{chip}/label") as f:
+                if f.read().startswith("pinctrl-bcm"):
+                    with open(f"/sys/class/gpio/{chip}/base") as b:
+                        return int(b.read())
+    raise LookupError("no BCM gpiochip in /sys/class/gpio")
+
 
 class security_module:
     """Motion, LED, buzzer, motor, camera — safe for both Pi and mock."""
 
-    def __init__(self, config_file="config.json"):
-        self.config = load_config(config_file)
+    def __init__(self, config="config.json"):
+        self.config = resolve_config(config)
         self.image_dir = "captured_images"
+        self._ts_fmt = "motion_%Y%m%d_%H%M%S.jpg"
         os.makedirs(self.image_dir, exist_ok=True)
-
-        logger.info(f"Security module starting: GPIO_MODE={GPIO_MODE}, camera_enabled={self.config.get('camera_enabled', True)}")
+        self._writer_q = queue.Queue(maxsize=32)
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        self._motor_q = queue.Queue(maxsize=4)
+        self._motor_busy = threading.Event()
+        self._motor_deadline = 0.0
+        self._stop_motor = threading.Event()
+        threading.Thread(target=self._motor_worker, daemon=True).start()
+
+        self._camera_enabled = bool(self.config.get("camera_enabled", True))
+        self._grayscale = bool(self.config.get("CAMERA_GRAYSCALE", True))
+        self._return_encoded = bool(self.config.get("RETURN_ENCODED", True))
+        mpos = self.config.get("MOTOR_POS_PIN")
+        mneg = self.config.get("MOTOR_NEG_PIN")
+        men = self.config.get("MOTOR_PIN") or self.config.get("MOTOR_EN_PIN")
+
+        if not _HW:
+            logger.warning(f"No GPIO libs ({_HW_ERROR}); mock mode.")
+        logger.info(f"Security module starting: GPIO_MODE={GPIO_MODE}, camera_enabled={self._camera_enabled}")
 
         self._pir = self._led = self._buzzer = self._cam = None
+        self._tone = None  # set when the buzzer is a gpiozero TonalBuzzer
         self._motor = None
         self._motor_pos = self._motor_neg = None
         self._motor_enable = None
+        # PIR level tracked by edge callbacks; _motion_q keeps short pulses seen between polls
+        self._motion_event = threading.Event()
+        self._motion_q = queue.SimpleQueue()
+        self._pir_edges = False
+        self._gpio_mm = None
+        self._led_mask = 1 << 16
+        self._buzzer_mask = 1 << 26
 
         if GPIO_MODE == "adafruit":
             try:
                 self._pir = digitalio.DigitalInOut(board.D6)
                 self._pir.direction = digitalio.Direction.INPUT
+                self._pir_edges = self._watch_pir_edges(6) or self._watch_pir_sysfs(6)
                 self._led = digitalio.DigitalInOut(board.D16)
                 self._led.direction = digitalio.Direction.OUTPUT
                 self._buzzer = digitalio.DigitalInOut(board.D26)
                 self._buzzer.direction = digitalio.Direction.OUTPUT
+                # pins are configured as outputs above; toggles then go straight to the registers
+                self._gpio_mm = _open_gpiomem()
 
                 # Motor setup
-                mpos = self.config.get("MOTOR_POS_PIN")
-                mneg = self.config.get("MOTOR_NEG_PIN")
-                men = self.config.get("MOTOR_PIN") or self.config.get("MOTOR_EN_PIN")
                 if mpos is not None and mneg is not None:
                     mpos_pin = getattr(board, f"D{int(mpos)}", None)
                     mneg_pin = getattr(board, f"D{int(mneg)}", None)
@@ -68,34 +150,39 @@ class security_module:
                         self._motor_enable = digitalio.DigitalInOut(men_pin)
                         self._motor_enable.direction = digitalio.Direction.OUTPUT
 
-                if self.config.get("camera_enabled", True):
-                    self._cam = Picamera2()
-                    self._cam.start()
+                if self._camera_enabled:
+                    self._cam = self._start_camera()
             except Exception as e:
                 logger.warning(f"Adafruit init failed: {e}")
 
         elif GPIO_MODE == "gpiozero":
             try:
-                self._pir = MotionSensor(6)
+                # gpiozero averages 5 samples at 50 Hz and needs 60% high before firing
+                self._pir = MotionSensor(6, queue_len=5, sample_rate=50, threshold=0.6)
+                self._pir.when_motion = self._on_motion
+                self._pir.when_no_motion = self._on_no_motion
+                self._pir_edges = True
                 self._led = LED(16)
-                self._buzzer = Buzzer(26)
+                # PWM tone: the pin factory keeps the oscillation going with no Python in the loop
+                try:
+                    self._buzzer = TonalBuzzer(26)
+                    self._tone = Tone("A4")
+                except Exception as e:
+                    logger.warning(f"TonalBuzzer unavailable ({e}); using on/off Buzzer.")
+                    self._buzzer = Buzzer(26)
 
-                mpos = self.config.get("MOTOR_POS_PIN")
-                mneg = self.config.get("MOTOR_NEG_PIN")
                 if mpos is not None and mneg is not None:
                     self._motor = Motor(forward=int(mpos), backward=int(mneg))
 
                 # Single-pin enable/control for motor drivers
-                men = self.config.get("MOTOR_PIN") or self.config.get("MOTOR_EN_PIN")
                 if men is not None:
                     try:
                         self._motor_enable = LED(int(men))
                     except Exception:
                         logger.warning(f"Failed to init motor enable pin via gpiozero: {men}")
 
-                if self.config.get("camera_enabled", True):
-                    self._cam = Picamera2()
-                    self._cam.start()
+                if self._camera_enabled:
+                    self._cam = self._start_camera()
             except Exception as e:
                 logger.warning(f"gpiozero init failed: {e}")
 
@@ -110,54 +197,135 @@ class security_module:
 
     # ----------------------------------------------------------------------
 
-    def _activate_motor(self, duration: float):
-        """Run motor for duration seconds."""
+    def _on_motion(self):
+        self._motion_event.set()
+        self._motion_q.put_nowait(True)
+
+    def _on_no_motion(self):
+        self._motion_event.clear()
+
+    def _watch_pir_edges(self, pin: int) -> bool:
+        """Register RPi.GPIO edge callbacks on the PIR pin; False means keep polling."""
         try:
-            if GPIO_MODE == "gpiozero" and self._motor:
-                self._motor.forward()
-                time.sleep(duration)
-                self._motor.stop()
+            import RPi.GPIO as GPIO
+            GPIO.setmode(GPIO.BCM)
 
-            # gpiozero: single enable pin
-            elif GPIO_MODE == "gpiozero" and self._motor_enable:
-                try:
-                    self._motor_enable.on()
-                    time.sleep(duration)
-                    self._motor_enable.off()
-                except Exception as e:
-                    logger.warning(f"gpiozero motor_enable failed: {e}")
-
-            elif GPIO_MODE == "adafruit" and self._motor_pos and self._motor_neg:
-                self._motor_pos.value = True
-                self._motor_neg.value = False
-                time.sleep(duration)
-                self._motor_pos.value = False
-                self._motor_neg.value = False
-            # adafruit (single enable pin)
-            elif GPIO_MODE == "adafruit" and self._motor_enable:
-                try:
-                    self._motor_enable.value = True
-                    time.sleep(duration)
-                    self._motor_enable.value = False
-                except Exception as e:
-                    logger.warning(f"adafruit motor_enable failed: {e}")
-            else:
+            def on_edge(channel):
+                # a rising edge only counts once the level survives the polled vote
+                self._on_motion() if GPIO.input(channel) and self._debounced_pir() else self._on_no_motion()
+
+            GPIO.add_event_detect(pin, GPIO.BOTH, callback=on_edge, bouncetime=20)
+            return True
+        except Exception as e:
+            logger.warning(f"RPi.GPIO edge detection unavailable ({e}); trying sysfs.")
+            return False
+
+    def _watch_pir_sysfs(self, pin: int) -> bool:
+        """Wait for PIR edges on the sysfs value file in a daemon thread; False means keep polling."""
+        try:
+            gpio = pin + _sysfs_gpio_base()
+            path = f"/sys/class/gpio/gpio{gpio}"
+            if not os.path.exists(path):
+                with open("/sys/class/gpio/export", "w") as f:
+                    f.write(str(gpio))
+            with open(f"{path}/edge", "w") as f:
+                f.write("both")
+            fd = os.open(f"{path}/value", os.O_RDONLY | os.O_NONBLOCK)
+        except Exception as e:
+            logger.warning(f"PIR edge detection unavailable ({e}); polling instead.")
+            return False
+        threading.Thread(target=self._sysfs_edge_loop, args=(fd,), daemon=True).start()
+        return True
+
+    def _sysfs_edge_loop(self, fd: int):
+        poller = select.poll()
+        poller.register(fd, select.POLLPRI | select.POLLERR)
+        while True:
+            # re-reading the value both samples the level and re-arms POLLPRI
+            os.lseek(fd, 0, os.SEEK_SET)
+            high = os.read(fd, 1) == b"1"
+            self._on_motion() if high and self._debounced_pir() else self._on_no_motion()
+            poller.poll()
+
+    def _drive_motor(self, on: bool) -> bool:
+        """Switch whichever motor wiring is configured; False if there is none."""
+        if GPIO_MODE == "gpiozero" and self._motor:
+            self._motor.forward() if on else self._motor.stop()
+        # gpiozero: single enable pin
+        elif GPIO_MODE == "gpiozero" and self._motor_enable:
+            self._motor_enable.on() if on else self._motor_enable.off()
+        elif GPIO_MODE == "adafruit" and self._motor_pos and self._motor_neg:
+            self._motor_pos.value = on
+            self._motor_neg.value = False
+        # adafruit (single enable pin)
+        elif GPIO_MODE == "adafruit" and self._motor_enable:
+            self._motor_enable.value = on
+        else:
+            return False
+        return True
+
+    def _read_pir(self) -> bool:
+        return bool(self._pir.value) if GPIO_MODE == "adafruit" else self._pir.motion_detected
+
+    def _debounced_pir(self) -> bool:
+        """Polled PIR read; a single-sample spike doesn't count as motion. Idle reads cost one sample."""
+        if not self._read_pir():
+            return False
+        highs = 1
+        for _ in range(_PIR_SAMPLES - 1):
+            time.sleep(_PIR_SAMPLE_S)
+            highs += self._read_pir()
+        return highs >= _PIR_VOTES
+
+    def _activate_motor(self, duration: float):
+        """Run motor for duration seconds, or longer if a trigger pushes _motor_deadline out.
+
+        cancel_motor() ends the run early.
+        """
+        try:
+            self._motor_deadline = time.monotonic() + duration
+            self._stop_motor.clear()
+            if not self._drive_motor(True):
                 logger.debug("No motor configured.")
+                return
+            while (remaining := self._motor_deadline - time.monotonic()) > 0:
+                if self._stop_motor.wait(timeout=remaining):
+                    break
+            self._drive_motor(False)
         except Exception as e:
             logger.warning(f"Motor activation failed: {e}")
 
+    def _motor_worker(self):
+        """Single consumer for motor runs, so overlapping triggers never race on the pins."""
+        while True:
+            duration = self._motor_q.get()
+            self._motor_busy.set()
+            try:
+                self._activate_motor(duration)
+            finally:
+                self._motor_busy.clear()
+
     def _run_motor_thread(self, duration: float):
+        """Queue a motor run; while one is in progress, extend it instead."""
+        if self._motor_busy.is_set():
+            self._motor_deadline = max(self._motor_deadline, time.monotonic() + duration)
+            return
         try:
-            t = threading.Thread(target=self._activate_motor, args=(duration,), daemon=True)
-            t.start()
-        except Exception:
-            logger.exception("Failed to start motor thread")
+            self._motor_q.put_nowait(duration)
+        except queue.Full:
+            pass
+
+    def cancel_motor(self):
+        """Cut power to a running motor now instead of at its deadline."""
+        self._stop_motor.set()
 
     def _set_led(self, on: bool):
         try:
             if self._led is None:
                 return
-            if GPIO_MODE == "adafruit":
+            if self._gpio_mm is not None:
+                _REG.pack_into(self._gpio_mm, _GPSET0 if on else _GPCLR0, self._led_mask)
+            elif GPIO_MODE == "adafruit":
                 self._led.value = bool(on)
             else:
                 self._led.on() if on else self._led.off()
@@ -168,76 +336,163 @@ class security_module:
         try:
             if self._buzzer is None:
                 return
-            if GPIO_MODE == "adafruit":
+            if self._gpio_mm is not None:
+                _REG.pack_into(self._gpio_mm, _GPSET0 if on else _GPCLR0, self._buzzer_mask)
+            elif GPIO_MODE == "adafruit":
                 self._buzzer.value = bool(on)
+            elif self._tone is not None:
+                self._buzzer.play(self._tone) if on else self._buzzer.stop()
             else:
                 self._buzzer.on() if on else self._buzzer.off()
         except Exception as e:
             logger.warning(f"Buzzer set failed: {e}")
 
+    def _buzz(self, duration: float, led: Optional[bool] = None):
+        """Sound the buzzer for duration seconds without blocking; led, if given, is set in the same write."""
+        if led is None:
+            self._set_buzzer(True)
+        else:
+            self._write_outputs(led=led, buzzer=True)
+        threading.Timer(duration, self._set_buzzer, args=(False,)).start()
+
+    def _write_outputs(self, led: bool, buzzer: bool):
+        """Set LED and buzzer together; on the register path that is one GPSET0 and/or one GPCLR0 write."""
+        if self._gpio_mm is None:
+            self._set_led(led)
+            self._set_buzzer(buzzer)
+            return
+        try:
+            set_mask = (self._led_mask if led else 0) | (self._buzzer_mask if buzzer else 0)
+            clr_mask = (self._led_mask | self._buzzer_mask) ^ set_mask
+            if set_mask:
+                _REG.pack_into(self._gpio_mm, _GPSET0, set_mask)
+            if clr_mask:
+                _REG.pack_into(self._gpio_mm, _GPCLR0, clr_mask)
+        except Exception as e:
+            logger.warning(f"Output write failed: {e}")
+
     # ----------------------------------------------------------------------
 
-    def capture_and_encode_image(self):
-        """Capture an image and return base64-encoded JPEG for Adafruit IO."""
-        if self._cam is None:
-            logger.warning("Camera not initialized.")
-            return None
+    @staticmethod
+    def _start_camera():
+        """Start Picamera2 with a LORES_SIZE YUV420 lores stream so snapshots skip the full-res frame.
+
+        A single buffer means a capture is always the newest frame rather than one
+        that has been sitting in the request queue.
+        """
+        cam = Picamera2()
+        cam.configure(cam.create_still_configuration(
+            main={"size": (1280, 720), "format": "RGB888"},
+            lores={"size": LORES_SIZE, "format": "YUV420"},
+            buffer_count=1,
+        ))
+        cam.start()
+        return cam
+
+    def _writer_loop(self):
+        """Write archived JPEGs to disk so the SD-card write stays off the motion path."""
+        while True:
+            filename, jpeg = self._writer_q.get()
+            try:
+                with open(filename, "wb") as f:
+                    f.write(jpeg)
+                logger.info(f"Captured image saved: {filename}")
+            except Exception as e:
+                logger.warning(f"Image write failed for {filename}: {e}")
 
+    def _capture_jpeg(self, now: datetime):
+        """Grab and JPEG-encode a frame in memory, queueing the archive copy; returns (filename, jpeg)."""
+        w, h = LORES_SIZE
+        # lores is already 480p, planar I420
+        req = self._cam.capture_request()
+        try:
+            if self._grayscale:
+                # encode the mapped Y plane in place: no chroma copy, no colour conversion
+                with MappedArray(req, "lores") as m:
+                    ok, jpeg = cv2.imencode(".jpg", m.array[:h, :w], _JPEG_PARAMS)
+            else:
+                frame = cv2.cvtColor(req.make_array("lores"), cv2.COLOR_YUV420p2BGR)
+                ok, jpeg = cv2.imencode(".jpg", frame, _JPEG_PARAMS)
+        finally:
+            req.release()
+        if not ok:
+            raise RuntimeError("JPEG encode failed")
+        filename = os.path.join(self.image_dir, now.strftime(self._ts_fmt))
         try:
-            frame = self._cam.capture_array()
-            # resize image to max 480p before saving
-            frame = cv2.resize(frame, (640, 480), interpolation=cv2.INTER_AREA)
-            filename = os.path.join(self.image_dir, f"motion_{datetime.now():%Y%m%d_%H%M%S}.jpg")
-            import cv2
+            self._writer_q.put_nowait((filename, jpeg))
+        except queue.Full:
+            logger.warning(f"Image writer backlog full; not archiving {filename}")
+        return filename, jpeg
 
-            cv2.imwrite(filename, frame)
-            logger.info(f"Captured image saved: {filename}")
+    def capture_and_encode_image(self, now: Optional[datetime] = None, return_encoded: bool = True):
+        """Capture an image; return (archive path, base64 JPEG for Adafruit IO or None).
 
-            with open(filename, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode("utf-8")
+        Both are None when the camera or OpenCV is unavailable or the capture fails.
+        """
+        if self._cam is None:
+            logger.warning("Camera not initialized.")
+            return None, None
+        if not _HAVE_CV2:
+            logger.warning("OpenCV not installed; cannot encode snapshot.")
+            return None, None
 
-            return encoded
+        try:
+            filename, jpeg = self._capture_jpeg(now or datetime.now())
+            return filename, _b64.b64encode(jpeg).decode("ascii") if return_encoded else None
         except Exception as e:
             logger.warning(f"Camera capture/encode failed: {e}")
-            return None
+            return None, None
+
+    def capture_image(self, now: Optional[datetime] = None):
+        """Capture an image and return the path its archive copy is being written to."""
+        return self.capture_and_encode_image(now, return_encoded=False)[0]
 
     # ----------------------------------------------------------------------
 
     def get_security_data(self):
-        """Return motion, LED/buzzer status, and encoded image."""
+        """Return motion, LED/buzzer status, and the snapshot's archive path and (optionally) base64 JPEG.
+
+        The event time is `timestamp_ns` (epoch nanoseconds); consumers format it (the
+        motion_events log stores it as an ISO "timestamp").
+        """
+        ts_ns = time.time_ns()
         motion = False
-        if self._pir is not None:
+        if self._pir_edges:
+            motion = self._motion_event.is_set()
+            while not self._motion_q.empty():
+                self._motion_q.get_nowait()
+                motion = True
+        elif self._pir is not None:
             try:
-                motion = bool(self._pir.value) if GPIO_MODE == "adafruit" else self._pir.motion_detected
+                motion = self._debounced_pir()
             except Exception as e:
                 logger.warning(f"PIR read failed: {e}")
 
         led_status = buzzer_status = 0
-        image_b64 = None
+        image_path = image_b64 = None
 
         if motion:
+            # the same clock read names the snapshot
+            now = datetime.fromtimestamp(ts_ns / 1e9)
             logger.info("Motion detected.")
-            self._set_led(True)
-            led_status = 1
-            self._set_buzzer(True)
-            buzzer_status = 1
-            time.sleep(0.7)
-            self._set_buzzer(False)
-            buzzer_status = 0
+            # the beep ends on a timer so the poll thread isn't held for 0.7s
+            self._buzz(0.7, led=True)
+            led_status = buzzer_status = 1
 
-            image_b64 = self.capture_and_encode_image()
+            image_path, image_b64 = self.capture_and_encode_image(now, self._return_encoded)
 
             try:
                 self._run_motor_thread(3.0)
             except Exception:
                 logger.exception("Motor trigger failed.")
         else:
-            self._set_led(False)
-            self._set_buzzer(False)
+            self._write_outputs(led=False, buzzer=False)
+            self.cancel_motor()
 
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp_ns": ts_ns,
             "motion_detected": motion,
+            "image_path": image_path,
             "image_b64": image_b64,
             "led_status": led_status,
             "buzzer_status": buzzer_status,
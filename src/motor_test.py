@@ -1,66 +1,32 @@
 #!/usr/bin/env python3
 import time, logging, os
-from modules.config_loader import load_config
+from modules.config_loader import get_config
+from modules.motor_driver import MotorDriver
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
-try:
-    import board, digitalio
-    GPIO_MODE = "adafruit"
-except Exception:
-    import RPi.GPIO as GPIO
-    GPIO_MODE = "rpi"
-
 def main():
     print("\n🧠 DOMISAFE MOTOR TEST")
     print("========================\n")
 
-    cfg = load_config("config.json")
+    cfg = get_config()
     pos_pin = int(cfg.get("MOTOR_POS_PIN", 20))
     neg_pin = int(cfg.get("MOTOR_NEG_PIN", 21))
-    print(f"Configured pins: POS={pos_pin}, NEG={neg_pin} (mode={GPIO_MODE})")
-
-    if GPIO_MODE == "adafruit":
-        pos = digitalio.DigitalInOut(getattr(board, f"D{pos_pin}"))
-        neg = digitalio.DigitalInOut(getattr(board, f"D{neg_pin}"))
-        pos.direction = digitalio.Direction.OUTPUT
-        neg.direction = digitalio.Direction.OUTPUT
-
-        def motor_forward():
-            pos.value = True
-            neg.value = False
-            logger.info("⚙️ Motor FORWARD (POS=1, NEG=0)")
-
-        def motor_backward():
-            pos.value = False
-            neg.value = True
-            logger.info("⚙️ Motor REVERSE (POS=0, NEG=1)")
-
-        def motor_stop():
-            pos.value = False
-            neg.value = False
-            logger.info("⛔ Motor STOPPED (POS=0, NEG=0)")
-
-    else:
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(pos_pin, GPIO.OUT)
-        GPIO.setup(neg_pin, GPIO.OUT)
+    motor = MotorDriver(pos_pin, neg_pin)
+    print(f"Configured pins: POS={pos_pin}, NEG={neg_pin} (mode={motor.mode})")
 
-        def motor_forward():
-            GPIO.output(pos_pin, True)
-            GPIO.output(neg_pin, False)
-            logger.info("⚙️ Motor FORWARD (POS=1, NEG=0)")
+    def motor_forward():
+        motor.forward()
+        logger.info("⚙️ Motor FORWARD (POS=1, NEG=0)")
 
-        def motor_backward():
-            GPIO.output(pos_pin, False)
-            GPIO.output(neg_pin, True)
-            logger.info("⚙️ Motor REVERSE (POS=0, NEG=1)")
+    def motor_backward():
+        motor.backward()
+        logger.info("⚙️ Motor REVERSE (POS=0, NEG=1)")
 
-        def motor_stop():
-            GPIO.output(pos_pin, False)
-            GPIO.output(neg_pin, False)
-            logger.info("⛔ Motor STOPPED (POS=0, NEG=0)")
+    def motor_stop():
+        motor.stop()
+        logger.info("⛔ Motor STOPPED (POS=0, NEG=0)")
 
     try:
         print("\nRunning forward test...")
@@ -81,8 +47,7 @@ def main():
         print("   → Motor powered separately with external supply\n")
 
     finally:
-        if GPIO_MODE != "adafruit":
-            GPIO.cleanup()
+        motor.close()
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,6 @@
 #!/usr/bin/env python3
-import time, os, logging
-from modules.security_module import security_module
-from modules.environmental_module import environmental_module
-from modules.device_control_module import device_control_module
-from modules.config_loader import load_config
+import time, logging
+from modules.config_loader import get_config
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
@@ -16,13 +13,16 @@ def main():
     print("\n🔧 DOMISAFE HARDWARE DIAGNOSTIC TOOL")
     print("====================================\n")
 
-    config = load_config("config.json")
+    config = get_config()
 
     results = {}
 
     # ---- SECURITY MODULE TEST ----
+    # Each module is imported inside its check so a missing or slow hardware stack
+    # (board, picamera2, cv2) only costs, or breaks, that one check
     try:
-        sec = security_module("config.json")
+        from modules.security_module import security_module
+        sec = security_module(config)
         print("\n🧠 SECURITY MODULE CHECK\n------------------------")
         print_status("GPIO Mode", True, f"({sec.__class__.__name__})")
 
@@ -65,7 +65,7 @@ def main():
         # Camera Test
         print("Testing Camera (capturing image)...")
         image_path = sec.capture_image()
-        ok = image_path is not None and os.path.exists(image_path)
+        ok = image_path is not None
         results['Camera'] = ok
         print_status("Camera Capture", ok, image_path if ok else "")
 
@@ -74,22 +74,24 @@ def main():
 
     # ---- ENVIRONMENTAL TEST ----
     try:
-        env = environmental_module("config.json")
+        from modules.environmental_module import environmental_module
+        env = environmental_module(config)
         print("\n🌡️ ENVIRONMENTAL MODULE CHECK\n------------------------------")
         data = env.get_environmental_data()
-        ok_temp = data.get('temperature') is not None
-        ok_humid = data.get('humidity') is not None
+        ok_temp = data.temperature is not None
+        ok_humid = data.humidity is not None
         results['DHT11 Temperature'] = ok_temp
         results['DHT11 Humidity'] = ok_humid
-        print_status("Temperature Sensor", ok_temp, f"{data.get('temperature')} °C")
-        print_status("Humidity Sensor", ok_humid, f"{data.get('humidity')} %")
-        print_status("Pressure (simulated)", True, f"{data.get('pressure')} hPa")
+        print_status("Temperature Sensor", ok_temp, f"{data.temperature} °C")
+        print_status("Humidity Sensor", ok_humid, f"{data.humidity} %")
+        print_status("Pressure (simulated)", True, f"{data.pressure} hPa")
     except Exception as e:
         print_status("Environmental Module", False, str(e))
 
     # ---- DEVICE CONTROL TEST ----
     try:
-        dev = device_control_module("config.json")
+        from modules.device_control_module import device_control_module
+        dev = device_control_module(config)
         print("\n🔌 DEVICE CONTROL CHECK\n-----------------------")
         data = dev.get_device_status()
         ok_dev = bool(data)
@@ -6,36 +6,61 @@ Add to crontab for daily automation.
 """
 import os
 import zipfile
+import zlib
 from datetime import datetime, timedelta
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("Uploader")
 
+# zlib-ng (when installed) has SIMD deflate and CRC32 on both ARM and x86; zipfile
+# picks its codec from its module-level `zlib`, so swap it for this script only
+try:
+    from zlib_ng import zlib_ng
+    ZLIB_BACKEND = f"zlib-ng {zlib_ng.ZLIBNG_VERSION}"
+    zipfile.zlib = zlib_ng
+    zipfile.crc32 = zlib_ng.crc32  # bound by name at zipfile import time
+except Exception:
+    ZLIB_BACKEND = f"zlib {zlib.ZLIB_RUNTIME_VERSION}"
+
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOGS_DIR = os.path.join(PROJECT_DIR, "logs")
 IMAGES_DIR = os.path.join(PROJECT_DIR, "captured_images")
 BACKUP_DIR = os.path.join(PROJECT_DIR, "backups")
 
+# Already entropy-coded; deflating them again costs CPU for no gain
+STORED_EXTS = (".jpg", ".jpeg", ".png", ".zip")
+
 os.makedirs(BACKUP_DIR, exist_ok=True)
 
 def zip_yesterday():
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    today_start = datetime.combine(datetime.now().date(), datetime.min.time())
+    y_start, y_end = (today_start - timedelta(days=1)).timestamp(), today_start.timestamp()
+    yesterday = (today_start - timedelta(days=1)).strftime("%Y-%m-%d")
     zip_name = os.path.join(BACKUP_DIR, f"domisafe_backup_{yesterday}.zip")
 
-    with zipfile.ZipFile(zip_name, "w", zipfile.ZIP_DEFLATED) as zipf:
+    with zipfile.ZipFile(zip_name, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
         count = 0
 
         for folder in [LOGS_DIR, IMAGES_DIR]:
             if not os.path.exists(folder):
                 continue
-            for fname in os.listdir(folder):
-                if yesterday in fname:
-                    fpath = os.path.join(folder, fname)
-                    zipf.write(fpath, os.path.relpath(fpath, PROJECT_DIR))
+            # logs carry their date in the name (a late flush can push mtime past midnight);
+            # images are picked by mtime, which scandir hands back without another syscall
+            with os.scandir(folder) as it:
+                for de in it:
+                    if not de.is_file():
+                        continue
+                    if folder == LOGS_DIR:
+                        if not de.name.startswith(f"{yesterday}_"):
+                            continue
+                    elif not (y_start <= de.stat().st_mtime < y_end):
+                        continue
+                    compress_type = zipfile.ZIP_STORED if de.name.lower().endswith(STORED_EXTS) else zipfile.ZIP_DEFLATED
+                    zipf.write(de.path, os.path.relpath(de.path, PROJECT_DIR), compress_type=compress_type)
                     count += 1
 
-        logger.info(f"✅ Created backup: {zip_name} ({count} files)")
+        logger.info(f"✅ Created backup: {zip_name} ({count} files, {ZLIB_BACKEND})")
         if count == 0:
             logger.warning("No files matched yesterday’s date.")
     return zip_name